@@ -5,15 +5,20 @@ Xtralien
 """
 # Create a basic logger to make logging easier
 import datetime
+import functools
 import logging
 import os
+import queue
 import random
 import re
+import select
+import selectors
 import socket
 import sys
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
 
 log_levels = {
     'debug': logging.DEBUG,
@@ -30,6 +35,7 @@ logger.setLevel(
 try:
     import numpy
 except ImportError:
+    numpy = None
     logger.warning("Numpy not found, array and matrix will fail")
 
 
@@ -51,42 +57,103 @@ def process_strip(x):
 
 
 def process_array(x):
-    data = [float(y) for y in x.strip('\n[];').split(';')]
-    try:
-        return numpy.array(data)
-    except NameError:
-        return data
+    data = process_strip(x)
+    if numpy is None:
+        return [float(y) for y in data.split(';')]
+    # Converting the split strings inside numpy is faster than a list of
+    # floats and raises ValueError on malformed values as float() does
+    return numpy.array(data.split(';'), dtype=float)
 
 
 def process_matrix(x):
-    data = [
-        [float(z) for z in y.split(',')]
-        for y in x.strip('\n[];').split(';')
-    ]
-    try:
-        return numpy.array(data)
-    except NameError:
-        return data
-
-
-number_regex = r"(\-|\+)?[0-9]+(\.[0-9]+)?(e-?[0-9]+(\.[0-9]+)?)?"
+    data = process_strip(x)
+    if numpy is None:
+        return [[float(z) for z in y.split(',')] for y in data.split(';')]
+    # Ragged rows raise ValueError rather than being reshaped
+    return numpy.array(
+        [y.split(',') for y in data.split(';')], dtype=float
+    )
+
+
+number_regex = r"(?:\-|\+)?[0-9]+(?:\.[0-9]+)?(?:e-?[0-9]+(?:\.[0-9]+)?)?"
+# Every value must be followed by a separator or the closing bracket, as
+# optional separators let a run of digits be split into numbers in
+# exponentially many ways when the match fails
 re_matrix = re.compile(
-    r'(\[({number},{number}(;?))+\])\n?'.format(number=number_regex)
+    r'\[{row}(?:;{row})*;?\]\n?'.format(
+        row='{number},{number}'.format(number=number_regex)
+    )
+)
+re_array = re.compile(
+    r'\[{number}(?:;{number})*;?\]\n?'.format(number=number_regex)
 )
-re_array = re.compile(r'(\[({number}(;?))+\])\n?'.format(number=number_regex))
 re_number = re.compile(r'{number}\n?'.format(number=number_regex))
 
 
-def process_auto(x=None):
-    if x is None:
-        return x
-    if re_matrix.fullmatch(x):
-        return process_matrix(x)
-    elif re_array.fullmatch(x):
-        return process_array(x)
-    elif re_number.fullmatch(x):
-        return float(x)
-    elif '\n' in x:
+_NUMBER_CHARS = '0123456789+-.e'
+
+# Maps every byte of a response to its class: b'0' for characters that
+# can appear in a number, itself for brackets/separators/newlines and
+# b'?' for anything else
+_CHAR_CLASS = bytearray(b'?' * 256)
+for _char in _NUMBER_CHARS.encode('ascii'):
+    _CHAR_CLASS[_char] = ord('0')
+for _char in b'[],;\n':
+    _CHAR_CLASS[_char] = _char
+_CHAR_CLASS = bytes(_CHAR_CLASS)
+del _char
+
+
+def _classify(x):
+    """Pick the parser for a response from the characters it contains
+
+    This only guarantees that the characters are right for the parser,
+    not that they are well formed. Returns None if no parser applies.
+    """
+    if x.endswith('\n'):
+        x = x[:-1]
+
+    # Numbers and text are the most common responses and can be told
+    # apart without classifying every character
+    if x[:1] != '[':
+        if x and not x.strip(_NUMBER_CHARS):
+            return float
+        return None
+    if x[-1] != ']':
+        return None
+
+    try:
+        classes = x[1:-1].encode('ascii').translate(_CHAR_CLASS)
+    except UnicodeEncodeError:
+        return None
+    if not classes:
+        return None
+    if not classes.translate(None, b'0;'):
+        return process_array
+    if not classes.translate(None, b'0,;'):
+        return process_matrix
+    return None
+
+
+def _process_auto(x):
+    parse = _classify(x)
+    if parse is not None:
+        try:
+            return parse(x)
+        except ValueError:
+            pass
+        # The response has the right characters but is not well formed,
+        # so let the patterns decide whether this is an error or text
+        if x[:1] == '[':
+            if ',' in x:
+                if re_matrix.fullmatch(x):
+                    return process_matrix(x)
+            elif re_array.fullmatch(x):
+                return process_array(x)
+        elif re_number.fullmatch(x):
+            return float(x)
+
+    if '\n' in x:
         split_string = x.strip('\n;[]').split('\n')
         if len(split_string) < 2:
             return split_string[0]
@@ -95,6 +162,35 @@ def process_auto(x=None):
         return x
 
 
+# Numbers and text are immutable, so the result for responses that are
+# repeated (e.g. status queries) can be reused
+_process_unbracketed = functools.lru_cache(maxsize=1024)(_process_auto)
+
+
+def process_auto(x=None):
+    if x is None:
+        return x
+    # Arrays and matrices can be modified by the caller, so are parsed
+    # afresh every time
+    if x[:1] == '[':
+        return _process_auto(x)
+    result = _process_unbracketed(x)
+    if isinstance(result, list):
+        return list(result)
+    return result
+
+
+# The fields packed into a device's 48 bit serial number, as
+# (name, shift, mask)
+_SERIAL_FIELDS = (
+    ('board_number', 0, 0xffff),  # 16 bits
+    ('week', 16, 0x3f),  # 6 bits
+    ('year', 22, 0xff),  # 8 bits
+    ('model', 30, 0xff),  # 8 bits
+    ('product', 38, 0x3ff),  # 10 bits
+)
+
+
 class Device(object):
     formatters = {
         'strip': process_strip,
@@ -111,13 +207,23 @@ class Device(object):
         port: int = None,
         serial_timeout: float = 1,
         write_timeout: float = 1,
+        idle_timeout: float = 0.02,
     ) -> None:
         self.connections = []
         self._in_progress_lock = threading.Lock()
-        self._thread_pool = ThreadPoolExecutor(thread_name_prefix=f"xtralien")
+        self._last_command_time = 0.0
+        # Background commands (callback/spawn_thread) are queued for a
+        # single worker, as the device can only run one at a time anyway.
+        # The worker is started by the first background command.
+        self._queue = queue.SimpleQueue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._closed = False
 
         if port:
-            self.add_connection(SocketConnection(addr, port))
+            self.add_connection(SocketConnection(
+                addr, port, idle_timeout=idle_timeout
+            ))
         elif addr:
             self.add_connection(SerialConnection(
                 addr,
@@ -144,15 +250,26 @@ class Device(object):
     def add_connection(self, connection):
         self.connections.append(connection)
 
-    def command(self, command, returns=False, sleep_time=0.001):
+    def _wait(self, sleep_time):
+        # Keep at least sleep_time between commands, which has usually
+        # passed already while reading the previous response
         if sleep_time is not None:
-            time.sleep(sleep_time)
+            remaining = sleep_time - (
+                time.monotonic() - self._last_command_time
+            )
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def command(self, command, returns=False, sleep_time=0.001):
+        self._wait(sleep_time)
 
         conn = None
         try:
             for conn in self.connections:
                 conn.write(command)
-                return conn.read(returns)
+                response = conn.read(returns)
+                self._last_command_time = time.monotonic()
+                return response
         except ConnectionError:
             if conn is not None:
                 conn.close()
@@ -166,43 +283,123 @@ class Device(object):
             )
         )
 
+    def _exchange(self, writes, count, sleep_time):
+        # Write everything before reading the count single-line responses
+        conn = None
+        with self._in_progress_lock:
+            self._wait(sleep_time)
+            try:
+                for conn in self.connections:
+                    for data in writes:
+                        conn.write(data)
+                    responses = [conn.readline() for _ in range(count)]
+                    self._last_command_time = time.monotonic()
+                    return responses
+            except ConnectionError:
+                if conn is not None:
+                    conn.close()
+                    self.connections.remove(conn)
+                raise
+
+        logger.error(
+            "Can't send {count} commands\
+            because there are no open connections".format(
+                count=count
+            )
+        )
+
+    @staticmethod
+    def _terminate(commands):
+        return [
+            cmd if cmd.endswith('\n') else cmd + '\n' for cmd in commands
+        ]
+
+    def command_many(self, commands, format='auto', sleep_time=0.001):
+        """Send several commands before reading any of their responses
+
+        This saves waiting for a round trip between each command. Every
+        command must reply with a single line, and is sent terminated by
+        a newline so that the device can separate them.
+
+        :returns:
+            A list of the formatted responses, in the order of the commands
+        """
+        formatter = self.formatters.get(format, self._default_formatter)
+        commands = self._terminate(commands)
+        responses = self._exchange(commands, len(commands), sleep_time)
+        if responses is not None:
+            return [formatter(response) for response in responses]
+
+    def command_batch(self, commands, format='auto', sleep_time=0.001):
+        """Send several commands in a single write and read their responses
+
+        As command_many, but the newline separated commands are sent in
+        one write. If every response is a number (and the format is
+        'auto' or 'number') they are parsed together into one numpy array.
+
+        :returns:
+            A numpy array of the responses if they are all numbers,
+            otherwise a list of the formatted responses
+        """
+        commands = self._terminate(commands)
+        responses = self._exchange(
+            [''.join(commands)], len(commands), sleep_time
+        )
+        if responses is None:
+            return None
+
+        if (
+            numpy is not None
+            and format in ('auto', 'number')
+            and all(_classify(response) is float for response in responses)
+        ):
+            try:
+                return numpy.array(responses, dtype=float)
+            except ValueError:
+                pass
+        formatter = self.formatters.get(format, self._default_formatter)
+        return [formatter(response) for response in responses]
+
     def close(self):
-        self._thread_pool.shutdown(wait=False, cancel_futures=True)
+        # Cancel any queued commands and stop the worker
+        with self._worker_lock:
+            self._closed = True
+            while True:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    job[0].cancel()
+            if self._worker is not None:
+                self._queue.put(None)
+                self._worker = None
         for conn in self.connections:
             conn.close()
 
     @property
     def serial(self):
-        _serial = int('0x' + self('serial', format=None), 16)
+        _serial = int(self('serial', format=None), 16)
         return {
-            # 16 bits
-            'board_number': (_serial & 0x00000000FFFF),
-            # 6 bits
-            'week': (_serial & 0x0000003F0000) >> 16,
-            # 8 bits
-            'year': (_serial & 0x00003FC00000) >> 22,
-            # 8 bits
-            'model': (_serial & 0x003FC0000000) >> 30,
-            # 10 bits
-            'product': (_serial & 0xFFC000000000) >> 38
+            name: (_serial >> shift) & mask
+            for name, shift, mask in _SERIAL_FIELDS
         }
 
     @serial.setter
     def serial(self, serial_dict):
         # Set defaults
         dt = datetime.datetime.now()
-        week = serial_dict.get('week', int(dt.strftime('%W')))
-        year = serial_dict.get('year', dt.year - 2000)
-        model = serial_dict.get('model', 0)
-        product = serial_dict.get('product', 0)
-        board = serial_dict.get('board_number', 0)
+        defaults = {
+            'board_number': 0,
+            'week': int(dt.strftime('%W')),
+            'year': dt.year - 2000,
+            'model': 0,
+            'product': 0,
+        }
         # Create Serial
         _serial = 0x000000000000
-        _serial |= board & 0xffff
-        _serial |= (week & 0x3f) << 16
-        _serial |= (year & 0xff) << 22
-        _serial |= (model & 0xff) << 30
-        _serial |= (product & 0x3ff) << 38
+        for name, shift, mask in _SERIAL_FIELDS:
+            _serial |= (serial_dict.get(name, defaults[name]) & mask) << shift
 
         for i in range(6):
             self.eeprom.set(16383-i, (_serial & 0xff), response=0)
@@ -211,11 +408,12 @@ class Device(object):
 
         return self.serial
 
-    def __getattribute__(self, x):
-        if '__' in x or x in object.__dir__(self):
-            return object.__getattribute__(self, x)
-        else:
-            return CommandBuilder(self, [x])
+    def __getattr__(self, x):
+        # Only called when normal lookup fails, so real attributes are
+        # found without going through here
+        if '__' in x:
+            raise AttributeError(x)
+        return CommandBuilder(self, [x])
 
     def __getitem__(self, x):
         return CommandBuilder(self, [x])
@@ -224,8 +422,11 @@ class Device(object):
     def _default_formatter(x):
         return x
 
-    def __call__(
-            self, *args,
+    def __call__(self, *args, **kwargs):
+        return self._call(' '.join(str(x) for x in args), **kwargs)
+
+    def _call(
+            self, command,
             format = 'auto',
             response = True,
             callback = None,
@@ -233,7 +434,6 @@ class Device(object):
             sleep_time = 0.001,
     ):
         returns = bool(response or callback)
-        command = ' '.join(str(x) for x in args)
 
         if returns:
             formatter = self.formatters.get(format, self._default_formatter)
@@ -241,7 +441,7 @@ class Device(object):
             formatter = self._default_formatter
 
         if spawn_thread or callback:
-            future = self._thread_pool.submit(self._async_call, command, formatter)
+            future = self._submit(command, formatter)
             if callback is not None:
                 future.add_done_callback(lambda fut: callback(fut.result()))
             return future
@@ -255,6 +455,52 @@ class Device(object):
         with self._in_progress_lock:
             return formatter(self.command(command, returns=True))
 
+    def _submit(self, command, formatter):
+        with self._worker_lock:
+            if self._closed:
+                raise RuntimeError(
+                    "Cannot run commands in the background after the "
+                    "device has been closed"
+                )
+            if self._worker is None:
+                # The worker only holds a weak reference, so an unclosed
+                # device can still be collected, which stops the worker
+                work_queue = self._queue
+                device_ref = weakref.ref(
+                    self, lambda _: work_queue.put(None)
+                )
+                self._worker = threading.Thread(
+                    target=self._run_queue, args=(work_queue, device_ref),
+                    name="xtralien", daemon=True
+                )
+                self._worker.start()
+            future = Future()
+            self._queue.put((future, command, formatter))
+        return future
+
+    @staticmethod
+    def _run_queue(work_queue, device_ref):
+        while True:
+            job = work_queue.get()
+            if job is None:
+                return
+            future, command, formatter = job
+            del job
+            if not future.set_running_or_notify_cancel():
+                continue
+            device = device_ref()
+            if device is None:
+                future.set_exception(
+                    RuntimeError("The device has been garbage collected")
+                )
+                return
+            try:
+                future.set_result(device._async_call(command, formatter))
+            except BaseException as exc:
+                future.set_exception(exc)
+            finally:
+                del device, future
+
     def __repr__(self):
         if len(self.connections):
             return '<Device connection={connection}/>'.format(
@@ -270,25 +516,36 @@ class Device(object):
             family=socket.AF_INET,
             type=socket.SOCK_DGRAM
         )
+        udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         udp_socket.bind(('0.0.0.0', random.randrange(6000, 50000)))
         udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        udp_socket.settimeout(timeout)
+        udp_socket.setblocking(False)
         udp_socket.sendto(b"xtra", (broadcast_address, 8889))
-        devices = []
+
+        selector = selectors.DefaultSelector()
+        selector.register(udp_socket, selectors.EVENT_READ)
+        addresses = []
         try:
-            start_time = time.time()
-            while True:
-                if time.time() > (start_time + timeout):
-                    break
-                (_, ip_addr) = udp_socket.recvfrom(4)
-                if ip_addr:
-                    start_time = time.time()
-                devices.append(Device(addr=ip_addr[0], port=8888))
-        except socket.timeout:
-            pass
+            # Collect replies until none has arrived for `timeout` seconds,
+            # taking every reply that is waiting each time
+            while selector.select(timeout):
+                while True:
+                    try:
+                        (_, ip_addr) = udp_socket.recvfrom(4)
+                    except BlockingIOError:
+                        break
+                    addresses.append(ip_addr[0])
         finally:
+            selector.close()
             udp_socket.close()
-        return devices
+
+        if not addresses:
+            return []
+        # Connect to the devices concurrently rather than one at a time
+        with ThreadPoolExecutor(max_workers=min(len(addresses), 16)) as pool:
+            return list(pool.map(
+                lambda addr: Device(addr=addr, port=8888), addresses
+            ))
 
     @staticmethod
     def USB(com=None, *args, **kwargs):
@@ -297,7 +554,8 @@ class Device(object):
                 try:
                     com = serial_ports()[0]
                 except IndexError:
-                    continue
+                    # Wait for a device to be plugged in
+                    time.sleep(0.05)
                 else:
                     break
 
@@ -321,8 +579,18 @@ class Device(object):
     openNetwork = Network
 
     @staticmethod
-    def first(*args, **kwargs):
-        while True:
+    def first(*args, attempts=None, **kwargs):
+        """Open the first device found over USB, or else on the network
+
+        :param attempts:
+            How many times to look before giving up, or None to keep
+            looking until a device is found
+        :raises ConnectionError:
+            If no device was found in the given number of attempts
+        """
+        attempt = 0
+        while attempts is None or attempt < attempts:
+            attempt += 1
             try:
                 try:
                     com = serial_ports()[0]
@@ -330,27 +598,43 @@ class Device(object):
                 except IndexError:
                     return Device.discover(*args, **kwargs)[0]
             except IndexError:
-                continue
+                time.sleep(0.05)
+
+        raise ConnectionError(
+            "No device found after {attempts} attempts".format(
+                attempts=attempts
+            )
+        )
 
 
 class CommandBuilder:
     def __init__(self, device, command = None):
         self.device = device
         self.command = command or []
-
-    def __getattribute__(self, name):
-        if '__' in name or name in object.__dir__(self):
-            return object.__getattribute__(self, name)
-        else:
-            self.command.append(name)
-            return self
+        # The encoded command, built on the first call and reused until
+        # the command is extended
+        self._prefix = None
+
+    def __getattr__(self, name):
+        if '__' in name:
+            raise AttributeError(name)
+        self.command.append(name)
+        self._prefix = None
+        return self
 
     def __getitem__(self, value):
         self.command.append(value)
+        self._prefix = None
         return self
 
     def __call__(self, *args, **kwargs):
-        return self.device(*self.command, *args, **kwargs)
+        if self._prefix is None:
+            prefix = ' '.join(str(x) for x in self.command)
+            self._prefix = prefix.encode('utf-8')
+        command = self._prefix
+        if args:
+            command += b' ' + ' '.join(str(x) for x in args).encode('utf-8')
+        return self.device._call(command, **kwargs)
 
     def dup(self):
         return CommandBuilder(self.device, list(self.command))
@@ -363,6 +647,9 @@ class Connection(object):
     def read(self, *args, **kwargs):
         logging.error("Method not implemented (%s)" % self.read)
 
+    def readline(self):
+        return self.read(True)
+
     def write(self, *args, **kwargs):
         logging.error("Method not implemented (%s)" % self.write)
 
@@ -371,38 +658,91 @@ class Connection(object):
 
 
 class SocketConnection(Connection):
-    def __init__(self, host, port, timeout=0.07):
+    def __init__(self, host, port, timeout=0.07, idle_timeout=0.02):
         super(SocketConnection, self).__init__()
         self.host = host
         self.port = port
+        self.timeout = timeout
+        # How long the device may pause between the lines of a response.
+        # Every read waits this long after the last newline, so a device
+        # that only sends single-line responses can set it to 0.
+        self.idle_timeout = idle_timeout
         self.socket = socket.socket()
+        # Commands are small writes that are waited on, so send them
+        # straight away rather than letting Nagle's algorithm hold them
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
         self.socket.connect((host, port))
         self.socket.settimeout(timeout)
-
-    def read(self, wait=True):
-        retval = ""
-        if wait:
-            while retval == "":
-                try:
-                    retval = retval + str(self.socket.recv(576), 'utf-8')
-                except socket.timeout:
-                    continue
-
-        while True:
+        # Received data that has not been returned by read yet
+        self._rxbuf = bytearray()
+        # Reused for every recv, so that no bytes object is created per
+        # chunk received
+        self._recv_view = memoryview(bytearray(4096))
+
+    def _receive(self):
+        size = self.socket.recv_into(self._recv_view)
+        if not size:
+            raise ConnectionError(f"{self!r} was closed by the device")
+        self._rxbuf += self._recv_view[:size]
+
+    def _receive_until_idle(self, timeout):
+        while select.select([self.socket], [], [], timeout)[0]:
+            self._receive()
+
+    def _wait_for_newline(self, last=False):
+        # Like the serial connection, give up on the newline and return
+        # the partial line once the device has sent something and then
+        # gone quiet for the socket timeout
+        search = self._rxbuf.rfind if last else self._rxbuf.find
+        end = search(b'\n')
+        while end < 0:
+            start = len(self._rxbuf)
             try:
-                retval = retval + str(self.socket.recv(576), 'utf-8')
+                self._receive()
             except socket.timeout:
-                break
+                if self._rxbuf:
+                    return len(self._rxbuf)
+                continue
+            end = search(b'\n', start)
+        return end + 1
+
+    def _take(self, end):
+        retval = self._rxbuf[:end].decode('utf-8')
+        del self._rxbuf[:end]
 
         if retval:
             logger.debug(f"Read: {retval!r}")
         return retval
 
+    def read(self, wait=True):
+        if wait:
+            # Responses end with a newline, so stop once one has arrived
+            # and no more data follows within idle_timeout, rather than
+            # waiting for the full socket timeout. The idle wait keeps the
+            # lines of a multi-line response together. Any partial line
+            # is kept for the next read.
+            self._wait_for_newline(last=True)
+            self._receive_until_idle(self.idle_timeout or 0)
+            end = self._rxbuf.rfind(b'\n') + 1 or len(self._rxbuf)
+        else:
+            # Collect (and return) anything the device sends back until
+            # it goes quiet, so that it is not mistaken for the response
+            # to the next command
+            self._receive_until_idle(self.timeout)
+            end = len(self._rxbuf)
+        return self._take(end)
+
+    def readline(self):
+        return self._take(self._wait_for_newline())
+
     def write(self, cmd):
-        if type(cmd) == str:
-            cmd = bytes(cmd, 'utf-8')
+        # Bytes-like commands (e.g. from CommandBuilder) are sent as-is
+        if isinstance(cmd, str):
+            cmd = cmd.encode('utf-8')
         logger.debug(f"Write: {cmd!r}")
-        self.socket.send(cmd)
+        self.socket.sendall(cmd)
 
     def close(self):
         self.socket.close()
@@ -428,10 +768,27 @@ class SerialConnection(Connection):
             timeout=timeout,
             write_timeout=write_timeout,
         )
+        # Received data that has not been returned by read yet
+        self._rxbuf = bytearray()
 
     def read(self, wait=True):
         if wait:
-            retval = str(self.connection.readline(), 'utf-8')
+            # Read everything the port has buffered in one call, rather
+            # than a byte at a time as readline() does. Like readline(), a
+            # partial line is returned if the port times out.
+            end = self._rxbuf.find(b'\n') + 1
+            while not end:
+                start = len(self._rxbuf)
+                data = self.connection.read(
+                    max(1, self.connection.in_waiting)
+                )
+                if not data:
+                    end = len(self._rxbuf)
+                    break
+                self._rxbuf += data
+                end = self._rxbuf.find(b'\n', start) + 1
+            retval = self._rxbuf[:end].decode('utf-8')
+            del self._rxbuf[:end]
         else:
             retval = ''
 
@@ -440,12 +797,12 @@ class SerialConnection(Connection):
         return retval
 
     def write(self, cmd):
-        if type(cmd) == str:
-            cmd = bytes(cmd, 'utf-8')
+        if isinstance(cmd, str):
+            cmd = cmd.encode('utf-8')
         logger.debug(f"Write: {cmd!r}")
         self.connection.write(cmd)
-        while self.connection.out_waiting > 0:
-            continue
+        # Block until the data has been sent, without spinning on the CPU
+        self.connection.flush()
 
     def close(self):
         self.connection.close()
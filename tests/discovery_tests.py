@@ -0,0 +1,99 @@
+"""Tests for finding devices with the xtralien module
+
+Network discovery is tested against a responder on the loopback
+interface, which needs the device ports (8888 and 8889) to be free.
+"""
+import socket
+import threading
+import unittest
+from unittest import mock
+
+import xtralien
+
+
+class TestFirst(unittest.TestCase):
+    """Tests for opening the first device found
+    """
+    def test_attempts(self):
+        """Looking gives up after the given number of attempts
+        """
+        with mock.patch.object(xtralien, 'serial_ports', return_value=[]), \
+                mock.patch.object(
+                    xtralien.Device, 'discover', return_value=[]
+                ) as discover:
+            with self.assertRaises(ConnectionError):
+                xtralien.Device.first(attempts=3)
+        self.assertEqual(discover.call_count, 3)
+
+
+class FakeResponder(object):
+    """Answers discovery broadcasts on 8889 and accepts connections on 8888
+
+    Each broadcast is answered `replies` times, as if that many devices
+    were on the network.
+    """
+    def __init__(self, replies):
+        self.replies = replies
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            self.udp.bind(('127.0.0.1', 8889))
+            self.server.bind(('127.0.0.1', 8888))
+        except OSError:
+            self.udp.close()
+            self.server.close()
+            raise unittest.SkipTest("The device ports are in use")
+        self.server.listen(8)
+        # Poll, so that the thread notices the responder being closed
+        # and releases the port
+        self.udp.settimeout(0.01)
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while not self.closed.is_set():
+            try:
+                data, address = self.udp.recvfrom(16)
+            except socket.timeout:
+                continue
+            if data == b'xtra':
+                for _ in range(self.replies):
+                    self.udp.sendto(b'xtra', address)
+
+    def close(self):
+        self.closed.set()
+        self.thread.join()
+        self.udp.close()
+        self.server.close()
+
+
+class TestDiscover(unittest.TestCase):
+    """Tests for finding devices on the network
+    """
+    def test_devices(self):
+        """Every device that answers is connected to
+        """
+        responder = FakeResponder(replies=3)
+        self.addCleanup(responder.close)
+        devices = xtralien.Device.discover('127.0.0.1', timeout=0.1)
+        for device in devices:
+            self.addCleanup(device.close)
+        self.assertEqual(len(devices), 3)
+        for device in devices:
+            self.assertEqual(device.connection.host, '127.0.0.1')
+            self.assertEqual(device.connection.port, 8888)
+
+    def test_no_devices(self):
+        """Nothing is found if no device answers
+        """
+        responder = FakeResponder(replies=0)
+        self.addCleanup(responder.close)
+        self.assertEqual(
+            xtralien.Device.discover('127.0.0.1', timeout=0.1), []
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
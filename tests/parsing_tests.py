@@ -0,0 +1,86 @@
+"""Tests for the response formatters in the xtralien module
+
+The formatters convert the raw text returned by a device into
+Python (or numpy) values, with `process_auto` picking the
+formatter based on the shape of the response.
+"""
+import unittest
+import warnings
+
+import numpy as np
+
+import xtralien
+
+
+class TestProcessAuto(unittest.TestCase):
+    """Tests for automatic response detection
+    """
+    def test_number(self):
+        """Numbers are returned as floats
+        """
+        self.assertEqual(xtralien.process_auto('1.5\n'), 1.5)
+        self.assertEqual(xtralien.process_auto('-1.25e-3\n'), -1.25e-3)
+        self.assertEqual(xtralien.process_auto('+3'), 3.0)
+        self.assertEqual(xtralien.process_auto('1e+5\n'), 1e5)
+
+    def test_array(self):
+        """Bracketed, semicolon separated numbers are arrays
+        """
+        np.testing.assert_array_equal(
+            xtralien.process_auto('[1;2.5;-3e-2]\n'),
+            np.array([1, 2.5, -3e-2])
+        )
+
+    def test_matrix(self):
+        """Rows of comma separated numbers are matrices
+        """
+        np.testing.assert_array_equal(
+            xtralien.process_auto('[1,2;3,4;]\n'),
+            np.array([[1, 2], [3, 4]])
+        )
+        np.testing.assert_array_equal(
+            xtralien.process_auto('[1,2,3;4,5,6]\n'),
+            np.array([[1, 2, 3], [4, 5, 6]])
+        )
+
+    def test_text(self):
+        """Anything else is returned as (stripped) text
+        """
+        self.assertEqual(xtralien.process_auto('OK\n'), 'OK')
+        self.assertEqual(xtralien.process_auto('1-2\n'), '1-2')
+        self.assertEqual(xtralien.process_auto('a\nb\n'), ['a', 'b'])
+        self.assertEqual(xtralien.process_auto('[abc]\n'), 'abc')
+        self.assertEqual(xtralien.process_auto('[1,2;3]\n'), '1,2;3')
+        self.assertIsNone(xtralien.process_auto(None))
+
+    def test_malformed(self):
+        """Malformed arrays are returned as text without numpy warnings
+        """
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertEqual(xtralien.process_auto('[1;;2]\n'), '1;;2')
+            self.assertEqual(xtralien.process_auto('[1-2;3]\n'), '1-2;3')
+            self.assertEqual(xtralien.process_auto('[1,2;3]\n'), '1,2;3')
+        self.assertEqual(
+            [w for w in caught if issubclass(w.category, DeprecationWarning)],
+            []
+        )
+
+    def test_malformed_formatter(self):
+        """The array formatter raises ValueError on malformed data
+        """
+        with self.assertRaises(ValueError):
+            xtralien.process_array('[1;;2]\n')
+
+    def test_ragged_matrix(self):
+        """Matrices with rows of different widths are not reshaped
+        """
+        self.assertEqual(
+            xtralien.process_auto('[1,2;3,4,5;6]\n'), '1,2;3,4,5;6'
+        )
+        with self.assertRaises(ValueError):
+            xtralien.process_matrix('[1,2;3,4,5;6]')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""Tests for the serial connection of the xtralien module
+
+The serial port is replaced by an in-memory fake, so pySerial is not
+needed to run these.
+"""
+import types
+import unittest
+from unittest import mock
+
+import xtralien
+
+
+class FakePort(object):
+    """A serial port whose received data is set by the test
+    """
+    def __init__(self, port, timeout=None, write_timeout=None):
+        self.received = bytearray()
+        self.written = bytearray()
+        self.reads = 0
+
+    @property
+    def in_waiting(self):
+        return len(self.received)
+
+    def read(self, size=1):
+        # An empty result is how pySerial reports a timeout
+        self.reads += 1
+        data = bytes(self.received[:size])
+        del self.received[:size]
+        return data
+
+    def write(self, data):
+        self.written += data
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestSerialConnection(unittest.TestCase):
+    """Tests for reading responses from a SerialConnection
+    """
+    def setUp(self):
+        fake_serial = types.SimpleNamespace(Serial=FakePort)
+        with mock.patch.object(xtralien, 'serial', fake_serial):
+            self.connection = xtralien.SerialConnection('fake')
+        self.port = self.connection.connection
+
+    def test_line(self):
+        """A buffered response is read in one call
+        """
+        self.port.received += b'[1;2;3]\n'
+        self.assertEqual(self.connection.read(), '[1;2;3]\n')
+        self.assertEqual(self.port.reads, 1)
+
+    def test_following_lines(self):
+        """Lines after the first are kept for the next read
+        """
+        self.port.received += b'1\n2\npart'
+        self.assertEqual(self.connection.read(), '1\n')
+        self.assertEqual(self.connection.read(), '2\n')
+        self.assertEqual(self.connection.read(), 'part')
+
+    def test_timeout(self):
+        """A timeout returns what has arrived, as readline() did
+        """
+        self.assertEqual(self.connection.read(), '')
+        self.assertEqual(self.connection.read(wait=False), '')
+
+    def test_write(self):
+        """Commands are encoded and written
+        """
+        self.connection.write('smu1 measure')
+        self.connection.write(b' 1')
+        self.assertEqual(self.port.written, b'smu1 measure 1')
+
+
+if __name__ == "__main__":
+    unittest.main()
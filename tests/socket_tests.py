@@ -0,0 +1,271 @@
+"""Tests for the socket connection of the xtralien module
+
+The device is replaced by a socket on the loopback interface, either
+driven directly by the test or answering commands from a thread.
+"""
+import gc
+import socket
+import threading
+import time
+import unittest
+import weakref
+
+import numpy as np
+
+import xtralien
+
+
+def listen():
+    """Open a listening socket on a free loopback port
+    """
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    return server
+
+
+class FakeDevice(object):
+    """A device that answers every command it receives
+
+    Commands are split on newlines, or taken one per received chunk if
+    it has none, and answered with `reply(command) + '\\n'`.
+    """
+    def __init__(self, reply):
+        self.reply = reply
+        self.server = listen()
+        self.port = self.server.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        try:
+            peer, _ = self.server.accept()
+        except OSError:
+            # The test finished before the connection was accepted
+            return
+        pending = ''
+        with peer:
+            while True:
+                try:
+                    data = peer.recv(4096)
+                except OSError:
+                    # The device was closed with replies still unread
+                    return
+                if not data:
+                    return
+                data = data.decode('utf-8')
+                if '\n' in data:
+                    # Keep a command split across chunks for the next one
+                    *commands, pending = (pending + data).split('\n')
+                else:
+                    commands, pending = [pending + data], ''
+                for command in commands:
+                    # Give the client time to read the replies separately
+                    time.sleep(0.002)
+                    peer.sendall(
+                        (self.reply(command) + '\n').encode('utf-8')
+                    )
+
+    def close(self):
+        self.server.close()
+
+
+class TestSocketConnection(unittest.TestCase):
+    """Tests for reading responses from a SocketConnection
+    """
+    def setUp(self):
+        self.server = listen()
+        self.connection = xtralien.SocketConnection(
+            *self.server.getsockname()
+        )
+        self.peer, _ = self.server.accept()
+
+    def tearDown(self):
+        self.connection.close()
+        self.peer.close()
+        self.server.close()
+
+    def test_line(self):
+        """A response is read up to its newline
+        """
+        self.peer.sendall(b'1.5\n')
+        self.assertEqual(self.connection.read(), '1.5\n')
+
+    def test_partial_line(self):
+        """A partial line is kept for the next read
+        """
+        self.peer.sendall(b'a\nb')
+        self.assertEqual(self.connection.read(), 'a\n')
+        self.peer.sendall(b'c\n')
+        self.assertEqual(self.connection.read(), 'bc\n')
+
+    def test_multiple_lines(self):
+        """The lines of a response arriving separately are read together
+        """
+        self.peer.sendall(b'line1\n')
+        threading.Timer(0.01, self.peer.sendall, [b'line2\n']).start()
+        self.assertEqual(self.connection.read(), 'line1\nline2\n')
+
+    def test_unterminated(self):
+        """A response without a newline is returned after the timeout
+        """
+        self.peer.sendall(b'abc')
+        self.assertEqual(self.connection.read(), 'abc')
+        self.peer.sendall(b'def')
+        self.assertEqual(self.connection.readline(), 'def')
+
+    def test_no_idle_timeout(self):
+        """Without an idle timeout a read returns at the newline
+        """
+        self.connection.idle_timeout = 0
+        self.peer.sendall(b'line1\n')
+        threading.Timer(0.05, self.peer.sendall, [b'line2\n']).start()
+        start = time.monotonic()
+        self.assertEqual(self.connection.read(), 'line1\n')
+        self.assertLess(time.monotonic() - start, 0.04)
+        self.assertEqual(self.connection.read(), 'line2\n')
+
+    def test_readline(self):
+        """readline returns a single line at a time
+        """
+        self.peer.sendall(b'1\n2\n')
+        self.assertEqual(self.connection.readline(), '1\n')
+        self.assertEqual(self.connection.readline(), '2\n')
+
+    def test_closed(self):
+        """Reading from a connection closed by the device raises
+        """
+        self.peer.close()
+        with self.assertRaises(ConnectionError):
+            self.connection.read()
+
+
+class TestNumericDevice(unittest.TestCase):
+    """Tests for a device that echoes the last word of each command
+    """
+    def setUp(self):
+        self.fake = FakeDevice(lambda command: command.split()[-1])
+        self.device = xtralien.Device('127.0.0.1', self.fake.port)
+
+    def tearDown(self):
+        self.device.close()
+        self.fake.close()
+
+    def test_command_many(self):
+        """Pipelined responses are formatted individually
+        """
+        self.assertEqual(
+            self.device.command_many(['echo 1', 'echo 2.5', 'echo x']),
+            [1.0, 2.5, 'x']
+        )
+
+    def test_command_batch_numbers(self):
+        """Numeric batch responses are returned as one array
+        """
+        result = self.device.command_batch(
+            ['echo %d' % i for i in range(50)]
+        )
+        self.assertIsInstance(result, np.ndarray)
+        np.testing.assert_array_equal(result, np.arange(50))
+
+    def test_command_batch_mixed(self):
+        """Batches with non-numeric responses are returned as lists
+        """
+        self.assertEqual(
+            self.device.command_batch(['echo 1', 'echo x', 'echo 1-2']),
+            [1.0, 'x', '1-2']
+        )
+        self.assertEqual(
+            self.device.command_batch(['echo 2'], format='none'),
+            ['2\n']
+        )
+
+
+class TestSocketDevice(unittest.TestCase):
+    """Tests for sending commands to a device over a socket
+    """
+    def setUp(self):
+        self.fake = FakeDevice(lambda command: 'reply:' + command)
+        self.device = xtralien.Device('127.0.0.1', self.fake.port)
+
+    def tearDown(self):
+        if self.device is not None:
+            self.device.close()
+        self.fake.close()
+
+    def test_command(self):
+        """Each command returns its own response
+        """
+        self.assertEqual(self.device('get', 1), 'reply:get 1')
+        self.assertEqual(self.device.smu1.get(2), 'reply:smu1 get 2')
+
+    def test_no_response(self):
+        """A reply to a command without a response is not returned later
+        """
+        self.device('set', 1, response=False)
+        self.assertEqual(self.device('get', 2), 'reply:get 2')
+
+    def test_command_many(self):
+        """Pipelined commands return their responses in order
+        """
+        self.assertEqual(
+            self.device.command_many(['a', 'b\n', 'c'], format='strip'),
+            ['reply:a', 'reply:b', 'reply:c']
+        )
+        self.assertEqual(self.device('after'), 'reply:after')
+
+    def test_background(self):
+        """Background commands resolve their futures and callbacks
+        """
+        results = []
+        future = self.device('get', 1, callback=results.append)
+        self.assertEqual(future.result(timeout=1), 'reply:get 1')
+        self.assertEqual(
+            self.device('get', 2, spawn_thread=True).result(timeout=1),
+            'reply:get 2'
+        )
+        self.assertEqual(results, ['reply:get 1'])
+
+    def test_background_after_close(self):
+        """Background commands cannot be started on a closed device
+        """
+        self.device.close()
+        with self.assertRaises(RuntimeError):
+            self.device('get', 1, spawn_thread=True)
+
+    def test_background_collected(self):
+        """The worker does not keep an unclosed device alive
+        """
+        threads = threading.active_count()
+        self.device('get', 1, spawn_thread=True).result(timeout=1)
+        device = weakref.ref(self.device)
+        self.device = None
+        gc.collect()
+        self.assertIsNone(device())
+
+        # The worker exits once the device has been collected
+        deadline = time.monotonic() + 1
+        while threading.active_count() >= threads:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+
+class TestFailedConnection(unittest.TestCase):
+    """Tests for devices that could not be connected to
+    """
+    def test_no_thread_leak(self):
+        """A failed connection leaves no worker thread behind
+        """
+        server = listen()
+        port = server.getsockname()[1]
+        server.close()
+
+        threads = threading.active_count()
+        for _ in range(3):
+            with self.assertRaises(ConnectionError):
+                xtralien.Device('127.0.0.1', port)
+        self.assertEqual(threading.active_count(), threads)
+
+
+if __name__ == "__main__":
+    unittest.main()